@@ -897,7 +897,8 @@ class PioNandCommander:
             tx_dma0 = self._setup_tx_dma_byte(dreq=Dreq.PIO1_SM0_TX, sm=sm4, data=data)
             tx_dma0.active(1)
 
-            rx_data = array.array("I", Util.roundup4(len(data)) * [0])
+            # 0埋めのbytearrayから確保する (要素数分のlistを作らない)
+            rx_data = array.array("I", bytearray(4 * Util.roundup4(len(data))))
             rx_dma0 = rp2.DMA()
             rx_dma0_ctrl = rx_dma0.pack_ctrl(
                 size=2,  # 4byte転送
@@ -157,6 +157,8 @@ def sim(
         )
         return
 
+    # programのアセンブルは全scenarioで共通なので1回だけ行う
+    simulator = Simulator(program_str)
     with Progress() as progress:
         task = progress.add_task("Simulating scenario...", total=len(target_scenarios))
         for scenario in target_scenarios:
@@ -164,10 +166,10 @@ def sim(
             # payload_fにarray.arrayを渡してtx_fifo_entriesを生成
             tx_fifo_entries = array.array("I")
             scenario.payload_f(tx_fifo_entries)
-            ret: Result = Simulator.execute(
-                program_str=program_str,
+            ret: Result = simulator.run(
                 test_cycles=scenario.test_cycles,
                 tx_fifo_entries=tx_fifo_entries,
+                render_svg=True,
             )
             output_dir = output_path / scenario.name
             output_dir.mkdir(parents=True, exist_ok=True)
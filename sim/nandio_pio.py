@@ -1,5 +1,38 @@
 import array
 import math
+import sys
+
+# 実機(MicroPython)で動作しているか. host(CPython)とで処理を切り替える箇所で参照する
+IS_MICROPYTHON = sys.implementation.name == "micropython"
+
+if IS_MICROPYTHON:
+    import micropython
+    from micropython import const
+else:
+    # host(CPython)用の代替. native/viper compileは行わず、constはそのままの値を返す
+    class micropython:
+        @staticmethod
+        def native(f):
+            return f
+
+        @staticmethod
+        def viper(f):
+            return f
+
+    def const(value: int) -> int:
+        return value
+
+    # viperの型注釈
+    ptr32 = array.array
+
+numpy = None
+if not IS_MICROPYTHON:
+    # host(CPython)ではnumpyで一括処理する
+    # MicroPythonではulabのnumpyがあっても'I'のfrombufferに対応していないので、常にviperの処理を使う
+    try:
+        import numpy
+    except ImportError:
+        pass
 
 # Logical Block Address
 LBA = int
@@ -19,6 +52,14 @@ COLUMN = int
 BLOCK_BITMAP = int
 
 
+# NAND Addressの各fieldのmask. MicroPythonでは`_`始まりのconstは即値に展開される
+_BYTE_MASK = const(0xFF)
+_COLUMN_ADDR_MASK = const(0xFFF)
+_PAGE_ADDR_MASK = const(0x3F)
+_PAGE_ADDR_BITS = const(6)
+_BLOCK_ADDR_MASK = const(0x3FF)
+
+
 class NandConfig:
     """
     NAND Flash Configuration for JISC-SSD TC58NVG0S3HTA00
@@ -97,10 +138,27 @@ class PinAssign:
     RBB = 15
 
 
+@micropython.viper
+def _bitor_words(words: ptr32, start: int, end: int, bits: int):
+    """uint32のwords[start:end]にbitsをORする. MicroPythonではviperでnative codeになる"""
+    for i in range(start, end):
+        words[i] = words[i] | bits
+
+
+# bit_onの0~31bitの値 (shiftせずにindexで引く)
+_BIT_ON = tuple(0x01 << i for i in range(32))
+
+
 class Util:
+    # これより長いarrayはnumpyで一括処理する (短い場合は呼び出しコストの方が大きい)
+    BULK_OR_THRESHOLD = 32
+
     @staticmethod
     def bit_on(bit_pos: int) -> int:
         """指定したbitだけ1の値"""
+        if 0 <= bit_pos < 32:
+            return _BIT_ON[bit_pos]
+        # 32bit以上はtableにないので計算する
         return 0x01 << bit_pos
 
     @staticmethod
@@ -108,28 +166,60 @@ class Util:
         """2byteの値を結合する"""
         return (high << 16) | low
 
-    @classmethod
-    def gen_ceb_bits(cls, cs: int | None = None) -> int:
+    @staticmethod
+    def gen_ceb_bits(cs: int | None = None) -> int:
         """cs指定からCEB0/CEB1のピン状態を返す"""
-        if cs is None:
-            return cls.bit_on(PinAssign.CEB0) | cls.bit_on(PinAssign.CEB1)
-        elif cs == 0:
-            return cls.bit_on(PinAssign.CEB1)
-        elif cs == 1:
-            return cls.bit_on(PinAssign.CEB0)
-        else:
+        # 分岐で範囲checkせず、tableに無いcsをエラーにする
+        ceb_bits = CEB_BITS_BY_CS.get(cs)
+        if ceb_bits is None:
+            raise ValueError("cs must be 0 or 1 or None")
+        return ceb_bits
+
+    @staticmethod
+    def lookup_cs(table: dict, cs: int | None):
+        """csごとに事前生成したtableから値を返す. tableに無いcsはgen_ceb_bitsと同じくエラーにする"""
+        value = table.get(cs)
+        if value is None:
             raise ValueError("cs must be 0 or 1 or None")
+        return value
 
     @classmethod
     def apply_cs(cls, data_src: int, cs: int | None) -> int:
-        """data_srcに対して、csを指定してCEB0/CEB1をセットする。単一変数・arrayどちらでも対応。arrayの場合は内容を変更する。"""
+        """単一の値data_srcに対して、csを指定してCEB0/CEB1をセットした値を返す。arrayはapply_cs_to_data_array/apply_cs_to_wordsを使う。"""
         return cls.gen_ceb_bits(cs) | data_src
 
     @classmethod
     def apply_cs_to_data_array(cls, data_src: array.array, cs: int | None) -> None:
-        """data_srcに対して、csを指定してCEB0/CEB1をセットする。arrayの場合は内容を変更する。"""
-        for i in range(len(data_src)):
-            data_src[i] = cls.gen_ceb_bits(cs) | data_src[i]
+        """data_src (uint32 'I' のarray) 全体に対して、csを指定してCEB0/CEB1をセットする。内容を変更する。"""
+        cls.apply_cs_to_words(data_src, cs, 0)
+
+    @classmethod
+    def apply_cs_to_words(
+        cls, words: array.array, cs: int | None, start: int = 0, end: int | None = None
+    ) -> None:
+        """uint32 ('I') のarrayのstart以降(endの手前まで)に対して、csを指定してCEB0/CEB1をセットする。内容を変更する。"""
+        ceb_bits = cls.gen_ceb_bits(cs)
+        if end is None:
+            end = len(words)
+        if numpy is not None and end - start > cls.BULK_OR_THRESHOLD:
+            # arrayのbufferをそのまま参照して、一括でORする
+            view = numpy.frombuffer(words, dtype=words.typecode)
+            view[start:end] |= ceb_bits
+            return
+        _bitor_words(words, start, end, ceb_bits)
+
+    @staticmethod
+    def extend_data_words(
+        arr: array.array, data: array.array | bytes | bytearray
+    ) -> None:
+        """arrの末尾にdataを1要素1wordで追加する. bytes/bytearrayは1byteを1wordに展開する"""
+        if IS_MICROPYTHON and isinstance(data, (bytes, bytearray)):
+            # MicroPythonのarray.extendはbufferをそのままcopyする(4byteで1word)ので、1byteずつ展開する
+            for b in data:
+                arr.append(b)
+            return
+        # CPythonのextendは要素ごとに変換するので、bytesもそのまま1byte=1wordになる
+        arr.extend(data)
 
     @staticmethod
     def roundup4(value: int) -> int:
@@ -137,44 +227,38 @@ class Util:
         return (value + 3) & ~0x03
 
 
+# CS未選択時のCEB0/CEB1の値 (両方High)
+CEB_BITS_NONE: int = Util.bit_on(PinAssign.CEB0) | Util.bit_on(PinAssign.CEB1)
+# CS0選択時のCEB0/CEB1の値 (CEB0だけLow)
+CEB_BITS_CS0: int = Util.bit_on(PinAssign.CEB1)
+# CS1選択時のCEB0/CEB1の値 (CEB1だけLow)
+CEB_BITS_CS1: int = Util.bit_on(PinAssign.CEB0)
+# cs(None含む)をkeyにしたCEB0/CEB1の値
+CEB_BITS_BY_CS = {None: CEB_BITS_NONE, 0: CEB_BITS_CS0, 1: CEB_BITS_CS1}
+
 # RBB以外全部Outputに設定するpindir値
-PIN_DIR_WRITE: int = (
-    Util.bit_on(PinAssign.REB)
-    | Util.bit_on(PinAssign.WEB)
-    | Util.bit_on(PinAssign.WPB)
-    | Util.bit_on(PinAssign.ALE)
-    | Util.bit_on(PinAssign.CLE)
-    | Util.bit_on(PinAssign.CEB1)
-    | Util.bit_on(PinAssign.CEB0)
-    | Util.bit_on(PinAssign.IO7)
-    | Util.bit_on(PinAssign.IO6)
-    | Util.bit_on(PinAssign.IO5)
-    | Util.bit_on(PinAssign.IO4)
-    | Util.bit_on(PinAssign.IO3)
-    | Util.bit_on(PinAssign.IO2)
-    | Util.bit_on(PinAssign.IO1)
-    | Util.bit_on(PinAssign.IO0)
-)
+# REB | WEB | WPB | ALE | CLE | CEB1 | CEB0 | IO7..IO0 (bit14..bit0)
+PIN_DIR_WRITE: int = const(0x7FFF)
 
 # RBB,IO以外Outputに設定するpindir値
-PIN_DIR_READ: int = (
-    Util.bit_on(PinAssign.REB)
-    | Util.bit_on(PinAssign.WEB)
-    | Util.bit_on(PinAssign.WPB)
-    | Util.bit_on(PinAssign.ALE)
-    | Util.bit_on(PinAssign.CLE)
-    | Util.bit_on(PinAssign.CEB1)
-    | Util.bit_on(PinAssign.CEB0)
-)
+# REB | WEB | WPB | ALE | CLE | CEB1 | CEB0 (bit14..bit8)
+PIN_DIR_READ: int = const(0x7F00)
 
 
 class NandAddr:
+    # create_full_addrで生成するAddress Inputのcycle数
+    FULL_ADDR_CYCLES = 4
+    # create_block_addrで生成するAddress Inputのcycle数
+    BLOCK_ADDR_CYCLES = 2
+
     @staticmethod
+    @micropython.native
     def create_full_addr(
         arr: array.array,
         column_addr: COLUMN,
         page_addr: PAGE,
         block_addr: BLOCK,
+        ceb_bits: int = 0,
     ) -> None:
         """アドレスをNAND Flashの指定フォーマットに変換する。Schematic Cell Layout and Address Assignment参照
 
@@ -188,19 +272,45 @@ class NandAddr:
         - CA0 to CA11: Column address
         - PA0 to PA5: Page address in block
         - PA6 to PA15: Block address
+
+        ceb_bits を指定すると、各cycleにCEB0/CEB1の値をORした状態で追加する。
         """
-        ca = column_addr & 0xFFF
-        pa = (page_addr & 0x3F) | ((block_addr & 0x3FF) << 6)
-        arr.append(ca & 0xFF)
-        arr.append((ca >> 8) & 0x0F)
-        arr.append(pa & 0xFF)
-        arr.append((pa >> 8) & 0xFF)
+        # 変換はwrite_full_addr_intoに一本化し、ここでは末尾に領域を確保してから書き込む
+        offset = len(arr)
+        for _ in range(NandAddr.FULL_ADDR_CYCLES):
+            arr.append(0)
+        NandAddr.write_full_addr_into(
+            arr, offset, column_addr, page_addr, block_addr, ceb_bits
+        )
+
+    @staticmethod
+    @micropython.native
+    def write_full_addr_into(
+        buf: array.array,
+        offset: int,
+        column_addr: COLUMN,
+        page_addr: PAGE,
+        block_addr: BLOCK,
+        ceb_bits: int = 0,
+    ) -> int:
+        """create_full_addrの変換本体。確保済みのbufのoffsetから4cycle分書き込み、書き込んだ次のoffsetを返す"""
+        ca = column_addr & _COLUMN_ADDR_MASK
+        pa = (page_addr & _PAGE_ADDR_MASK) | (
+            (block_addr & _BLOCK_ADDR_MASK) << _PAGE_ADDR_BITS
+        )
+        buf[offset] = ceb_bits | (ca & _BYTE_MASK)
+        buf[offset + 1] = ceb_bits | ((ca >> 8) & 0x0F)
+        buf[offset + 2] = ceb_bits | (pa & _BYTE_MASK)
+        buf[offset + 3] = ceb_bits | ((pa >> 8) & _BYTE_MASK)
+        return offset + 4
 
     @staticmethod
-    def create_block_addr(arr: array.array, block_addr: BLOCK) -> None:
-        """Block Addressを2byteのAddressInput用に変換する。Auto Block Erase用。"""
-        arr.append(block_addr & 0xFF)
-        arr.append((block_addr >> 8) & 0xFF)
+    def create_block_addr(
+        arr: array.array, block_addr: BLOCK, ceb_bits: int = 0
+    ) -> None:
+        """Block Addressを2byteのAddressInput用に変換する。Auto Block Erase用。ceb_bitsは各cycleにORする。"""
+        arr.append(ceb_bits | (block_addr & _BYTE_MASK))
+        arr.append(ceb_bits | ((block_addr >> 8) & _BYTE_MASK))
 
 
 class PioCmdId:
@@ -218,7 +328,17 @@ class PioCmdBuilder:
     """PIO Command Build helper"""
 
     @staticmethod
+    def pack_cmd_header(cmd_id: int, pindir: int, transfer_count: int) -> int:
+        """コマンドの先頭wordを生成する. `cmd_0 = { cmd_id[3:0], transfer_count[11:0], pindirs[15:0] }`"""
+        return (
+            ((cmd_id & 0xF) << 28)
+            | (((transfer_count - 1) & 0x0FFF) << 16)
+            | (pindir & 0xFFFF)
+        )
+
+    @classmethod
     def create_cmd_header(
+        cls,
         cmd_id: int,
         pindir: int,
         transfer_count: int,
@@ -226,58 +346,37 @@ class PioCmdBuilder:
         arr: array.array,
     ) -> None:
         """コマンドの先頭wordをarrに追加する."""
-        arr.append(
-            ((cmd_id & 0xF) << 28)
-            | ((((transfer_count - 1) & 0x0FFF) << 16) | (pindir & 0xFFFF))
-        )
+        arr.append(cls.pack_cmd_header(cmd_id, pindir, transfer_count))
         arr.append(cmd1 if cmd1 is not None else 0x00000000)
 
-    @classmethod
-    def init_pin(cls, arr: array.array) -> None:
+    @staticmethod
+    def init_pin(arr: array.array) -> None:
         """Initialize pin direction and set transfer count."""
-        cls.create_cmd_header(
-            cmd_id=PioCmdId.Bitbang,
-            pindir=PIN_DIR_WRITE,
-            transfer_count=1,
-            cmd1=Util.apply_cs(0x00, None),
-            arr=arr,
-        )
+        arr.extend(INIT_PIN_WORDS)
 
-    @classmethod
+    @staticmethod
     def assert_cs(
-        cls,
         arr: array.array,
         cs: int | None = None,
     ) -> None:
         """Set CEB0/CEB1 pin state."""
-        cls.create_cmd_header(
-            cmd_id=PioCmdId.Bitbang,
-            pindir=PIN_DIR_WRITE,
-            transfer_count=1,
-            cmd1=Util.apply_cs(0x00, cs),
-            arr=arr,
-        )
+        arr.append(CMD_HEADER_BITBANG)
+        arr.append(Util.gen_ceb_bits(cs))
 
-    @classmethod
-    def deassert_cs(cls, arr: array.array) -> None:
+    @staticmethod
+    def deassert_cs(arr: array.array) -> None:
         """Deassert CEB0/CEB1 pin state."""
-        cls.assert_cs(arr=arr, cs=None)
+        arr.extend(DEASSERT_CS_WORDS)
 
-    @classmethod
+    @staticmethod
     def cmd_latch(
-        cls,
         arr: array.array,
         cmd: int,
         cs: int | None,
     ) -> None:
         """Latch command to NAND Flash."""
-        cls.create_cmd_header(
-            cmd_id=PioCmdId.CmdLatch,
-            pindir=PIN_DIR_WRITE,
-            transfer_count=1,
-            cmd1=Util.apply_cs(cmd, cs),
-            arr=arr,
-        )
+        arr.append(CMD_HEADER_CMD_LATCH)
+        arr.append(Util.gen_ceb_bits(cs) | cmd)
 
     @classmethod
     def addr_latch(
@@ -287,7 +386,6 @@ class PioCmdBuilder:
         cs: int | None,
     ) -> None:
         """Latch address to NAND Flash."""
-        Util.apply_cs_to_data_array(addrs, cs)  # Ensure addresses are modified with CS
         cls.create_cmd_header(
             cmd_id=PioCmdId.AddrLatch,
             pindir=PIN_DIR_WRITE,
@@ -295,56 +393,97 @@ class PioCmdBuilder:
             cmd1=None,
             arr=arr,
         )
+        # 転送先にcopyしてからCSを付与する (addrsは変更しない)
+        start = len(arr)
         arr.extend(addrs)
+        Util.apply_cs_to_words(arr, cs, start)
+
+    @classmethod
+    def cached_cmd_header(
+        cls, cache: dict, cmd_id: int, pindir: int, transfer_count: int
+    ) -> int:
+        """transfer_countをkeyにcacheからコマンドの先頭wordを返す. 未登録の場合は生成してcacheする"""
+        header = cache.get(transfer_count)
+        if header is None:
+            header = cls.pack_cmd_header(cmd_id, pindir, transfer_count)
+            # 任意長の転送で際限なく増えないよう、上限に達したら追加しない
+            if len(cache) < CMD_HEADER_CACHE_SIZE:
+                cache[transfer_count] = header
+        return header
 
     @classmethod
     def data_output(cls, arr: array.array, data_count: int) -> None:
         """Output data from NAND Flash."""
-        cls.create_cmd_header(
-            cmd_id=PioCmdId.DataOutput,
-            pindir=PIN_DIR_READ,
-            transfer_count=data_count,
-            cmd1=None,
-            arr=arr,
+        arr.append(
+            cls.cached_cmd_header(
+                DATA_OUTPUT_HEADERS, PioCmdId.DataOutput, PIN_DIR_READ, data_count
+            )
         )
+        arr.append(0x00000000)
 
     @classmethod
     def data_input_only_header(cls, arr: array.array, data_count: int) -> None:
         """Input data header to NAND Flash."""
-        cls.create_cmd_header(
-            cmd_id=PioCmdId.DataInput,
-            pindir=PIN_DIR_WRITE,
-            transfer_count=data_count,
-            cmd1=None,
-            arr=arr,
+        arr.append(
+            cls.cached_cmd_header(
+                DATA_INPUT_HEADERS, PioCmdId.DataInput, PIN_DIR_WRITE, data_count
+            )
         )
+        arr.append(0x00000000)
 
     @classmethod
     def data_input(
         cls,
         arr: array.array,
-        data: array.array,
+        data: array.array | bytes | bytearray,
         cs: int,
     ) -> None:
-        """Input data to NAND Flash."""
-        Util.apply_cs_to_data_array(data, cs)  # Ensure data is modified with CS
+        """Input data to NAND Flash.
+
+        dataはuint32のarrayの他、bytes/bytearrayも受け付ける (1byteを1wordに展開する)
+        """
         cls.data_input_only_header(arr, len(data))
-        arr.extend(data)
+        # 転送先にcopyしてからCSを一括で付与する (dataは変更しない)
+        start = len(arr)
+        Util.extend_data_words(arr, data)
+        Util.apply_cs_to_words(arr, cs, start)
 
     @classmethod
-    def wait_rbb(cls, arr: array.array) -> None:
-        """Wait for RBB pin to be low."""
-        cls.create_cmd_header(
-            cmd_id=PioCmdId.WaitRbb,
-            pindir=PIN_DIR_WRITE,
-            transfer_count=1,
-            cmd1=None,
-            arr=arr,
+    def data_input_into(
+        cls,
+        buf: array.array,
+        offset: int,
+        data: array.array | bytes | bytearray,
+        cs: int,
+    ) -> int:
+        """data_inputと同じ内容を、確保済みのbuf (uint32 'I' のarray) のoffsetから書き込む。
+
+        bufはoffsetから2 + len(data) word以上を確保しておくこと。書き込んだ次のoffsetを返す
+        """
+        if isinstance(data, (bytes, bytearray)):
+            # slice代入はbytesを1byte=1wordに展開しないので、data_inputと同じ方法で展開しておく
+            words = array.array("I")
+            Util.extend_data_words(words, data)
+            data = words
+        data_count = len(data)
+        buf[offset] = cls.cached_cmd_header(
+            DATA_INPUT_HEADERS, PioCmdId.DataInput, PIN_DIR_WRITE, data_count
         )
+        buf[offset + 1] = 0x00000000
+        start = offset + 2
+        end = start + data_count
+        # 転送先にcopyしてからCSを一括で付与する (dataは変更しない)
+        buf[start:end] = data
+        Util.apply_cs_to_words(buf, cs, start, end)
+        return end
 
-    @classmethod
+    @staticmethod
+    def wait_rbb(arr: array.array) -> None:
+        """Wait for RBB pin to be low."""
+        arr.extend(WAIT_RBB_WORDS)
+
+    @staticmethod
     def full_addr_latch(
-        cls,
         arr: array.array,
         column_addr: int,
         page_addr: int,
@@ -352,30 +491,32 @@ class PioCmdBuilder:
         cs: int | None = None,
     ) -> None:
         """Latch full address to NAND Flash."""
-        addrs = array.array("I")
-        NandAddr.create_full_addr(addrs, column_addr, page_addr, block_addr)
-        cls.addr_latch(arr, addrs, cs)
+        # 転送数固定なので生成済みの先頭wordを使う
+        arr.append(CMD_HEADER_FULL_ADDR_LATCH)
+        arr.append(0x00000000)
+        # 一時arrayを作らず、CSを付与しながら転送先に直接書き込む
+        NandAddr.create_full_addr(
+            arr, column_addr, page_addr, block_addr, Util.gen_ceb_bits(cs)
+        )
 
-    @classmethod
+    @staticmethod
     def block_addr_latch(
-        cls,
         arr: array.array,
         block_addr: int,
         cs: int | None = None,
     ) -> None:
         """Latch block address to NAND Flash."""
-        addrs = array.array("I")
-        NandAddr.create_block_addr(addrs, block_addr)
-        cls.addr_latch(arr, addrs, cs)
+        # 転送数固定なので生成済みの先頭wordを使う
+        arr.append(CMD_HEADER_BLOCK_ADDR_LATCH)
+        arr.append(0x00000000)
+        # 一時arrayを作らず、CSを付与しながら転送先に直接書き込む
+        NandAddr.create_block_addr(arr, block_addr, Util.gen_ceb_bits(cs))
 
     @classmethod
     def seq_reset(cls, arr: array.array, cs: int) -> None:
         """Reset sequence for NAND Flash."""
-        cls.init_pin(arr)
-        cls.assert_cs(arr, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.RESET, cs=cs)
-        cls.wait_rbb(arr)
-        cls.deassert_cs(arr)
+        # 全体が固定なので、csごとに事前生成したものをcopyする
+        arr.extend(Util.lookup_cs(SEQ_RESET, cs))
 
     @classmethod
     def seq_read_id(
@@ -388,10 +529,17 @@ class PioCmdBuilder:
         """Read ID sequence for NAND Flash."""
         cls.init_pin(arr)
         cls.assert_cs(arr, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.READ_ID, cs=cs)
-        addrs = array.array("I")
-        addrs.append(offset)  # 1-byte address
-        cls.addr_latch(arr, addrs=addrs, cs=cs)
+        arr.append(CMD_HEADER_CMD_LATCH)
+        arr.append(Util.lookup_cs(CMD_WORD_READ_ID, cs))
+        # 1-byte address
+        cls.create_cmd_header(
+            cmd_id=PioCmdId.AddrLatch,
+            pindir=PIN_DIR_WRITE,
+            transfer_count=1,
+            cmd1=None,
+            arr=arr,
+        )
+        arr.append(Util.gen_ceb_bits(cs) | offset)
         cls.data_output(arr, data_count=data_count)
         cls.deassert_cs(arr)
 
@@ -406,12 +554,10 @@ class PioCmdBuilder:
         data_count: int,
     ) -> None:
         """Read sequence for NAND Flash."""
-        cls.init_pin(arr)
-        cls.assert_cs(arr, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.READ_1ST, cs=cs)
+        # address/data_output以外はcsごとに事前生成したものをcopyする
+        arr.extend(Util.lookup_cs(SEQ_READ_PREFIX, cs))
         cls.full_addr_latch(arr, column_addr, page_addr, block_addr, cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.READ_2ND, cs=cs)
-        cls.wait_rbb(arr)
+        arr.extend(SEQ_READ_MIDDLE[cs])
         cls.data_output(arr, data_count=data_count)
         cls.deassert_cs(arr)
 
@@ -422,11 +568,8 @@ class PioCmdBuilder:
         cs: int,
     ) -> None:
         """Read status sequence for NAND Flash."""
-        cls.init_pin(arr)
-        cls.assert_cs(arr, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.STATUS_READ, cs=cs)
-        cls.data_output(arr, data_count=1)
-        cls.deassert_cs(arr)
+        # 全体が固定なので、csごとに事前生成したものをcopyする
+        arr.extend(Util.lookup_cs(SEQ_STATUS_READ, cs))
 
     @classmethod
     def seq_program(
@@ -436,20 +579,141 @@ class PioCmdBuilder:
         column_addr: int,
         page_addr: int,
         block_addr: int,
-        data: array.array,
+        data: array.array | bytes | bytearray,
     ) -> None:
         """Program sequence for NAND Flash."""
-        cls.init_pin(arr)
-        cls.assert_cs(arr, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.PROGRAM_1ST, cs=cs)
+        # address/data以外はcsごとに事前生成したものをcopyする
+        arr.extend(Util.lookup_cs(SEQ_PROGRAM_PREFIX, cs))
         cls.full_addr_latch(arr, column_addr, page_addr, block_addr, cs)
         cls.data_input(arr, data=data, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.PROGRAM_2ND, cs=cs)
-        cls.wait_rbb(arr)
-        cls.cmd_latch(arr, cmd=NandCommandId.STATUS_READ, cs=cs)
-        cls.data_output(arr, data_count=1)
+        arr.extend(SEQ_PROGRAM_SUFFIX[cs])
+
+    @classmethod
+    def seq_program_multi(
+        cls,
+        arr: array.array,
+        cs: int,
+        column_addr: int,
+        start_page_addr: int,
+        block_addr: int,
+        datas: list,
+    ) -> None:
+        """同一block内の連続したpageに対するProgram sequence.
+
+        init_pin/assert_cs/deassert_csは全体で1回だけ行い、pageごとにprogramとstatus readを繰り返す。
+        RX FIFOにはpageごとのstatusがdatasの順に格納される。
+        """
+        if (
+            start_page_addr < 0
+            or start_page_addr + len(datas) > NandConfig.PAGES_PER_BLOCK
+        ):
+            raise ValueError("pages must be in the same block")
+        cmd_word = Util.lookup_cs(CMD_WORD_PROGRAM_1ST, cs)
+        cls.init_pin(arr)
+        cls.assert_cs(arr, cs=cs)
+        page_suffix = SEQ_PROGRAM_PAGE_SUFFIX[cs]
+        page_addr = start_page_addr
+        for data in datas:
+            arr.append(CMD_HEADER_CMD_LATCH)
+            arr.append(cmd_word)
+            cls.full_addr_latch(arr, column_addr, page_addr, block_addr, cs)
+            cls.data_input(arr, data=data, cs=cs)
+            arr.extend(page_suffix)
+            page_addr += 1
         cls.deassert_cs(arr)
 
+    @staticmethod
+    def seq_program_words(data_count: int) -> int:
+        """seq_programが生成するword数. seq_program_intoの転送先を確保する際に使う"""
+        return (
+            len(SEQ_PROGRAM_PREFIX[0])
+            + 2
+            + NandAddr.FULL_ADDR_CYCLES
+            + 2
+            + data_count
+            + len(SEQ_PROGRAM_SUFFIX[0])
+        )
+
+    @classmethod
+    def seq_program_into(
+        cls,
+        buf: array.array,
+        offset: int,
+        cs: int,
+        column_addr: int,
+        page_addr: int,
+        block_addr: int,
+        data: array.array | bytes | bytearray,
+    ) -> int:
+        """seq_programと同じ内容を、確保済みのbuf (uint32 'I' のarray) のoffsetから書き込む。
+
+        転送用bufferを使い回す場合に、appendによる再確保を避けるために使う。
+        bufはseq_program_wordsで求めたword数以上を確保しておくこと。書き込んだ次のoffsetを返す
+        """
+        ceb_bits = Util.gen_ceb_bits(cs)
+        prefix = Util.lookup_cs(SEQ_PROGRAM_PREFIX, cs)
+        pos = offset + len(prefix)
+        buf[offset:pos] = prefix
+        buf[pos] = CMD_HEADER_FULL_ADDR_LATCH
+        buf[pos + 1] = 0x00000000
+        pos = NandAddr.write_full_addr_into(
+            buf, pos + 2, column_addr, page_addr, block_addr, ceb_bits
+        )
+        pos = cls.data_input_into(buf, pos, data, cs)
+        suffix = SEQ_PROGRAM_SUFFIX[cs]
+        buf[pos : pos + len(suffix)] = suffix
+        return pos + len(suffix)
+
+    @classmethod
+    def make_seq_read(cls, data_count: int):
+        """data_count固定のseq_readを生成する. address以外のwordはcsごとに事前生成しておく"""
+        prefixes = SEQ_READ_PREFIX
+        suffixes = {}
+        for cs in CEB_BITS_BY_CS:
+            suffix = array.array("I", SEQ_READ_MIDDLE[cs])
+            cls.data_output(suffix, data_count=data_count)
+            cls.deassert_cs(suffix)
+            suffixes[cs] = suffix
+
+        def seq_read(
+            arr: array.array,
+            cs: int,
+            column_addr: int,
+            page_addr: int,
+            block_addr: int,
+        ) -> None:
+            """Read sequence for NAND Flash. (fixed data_count)"""
+            arr.extend(Util.lookup_cs(prefixes, cs))
+            cls.full_addr_latch(arr, column_addr, page_addr, block_addr, cs)
+            arr.extend(suffixes[cs])
+
+        return seq_read
+
+    @classmethod
+    def make_seq_program(cls, data_count: int):
+        """data_count固定のseq_programを生成する. data inputのheaderは事前にcacheへ登録しておく"""
+        cls.cached_cmd_header(
+            DATA_INPUT_HEADERS, PioCmdId.DataInput, PIN_DIR_WRITE, data_count
+        )
+
+        def seq_program(
+            arr: array.array,
+            cs: int,
+            column_addr: int,
+            page_addr: int,
+            block_addr: int,
+            data: array.array | bytes | bytearray,
+        ) -> None:
+            """Program sequence for NAND Flash. (fixed data_count)"""
+            if len(data) != data_count:
+                raise ValueError(f"data length must be {data_count}")
+            arr.extend(Util.lookup_cs(SEQ_PROGRAM_PREFIX, cs))
+            cls.full_addr_latch(arr, column_addr, page_addr, block_addr, cs)
+            cls.data_input(arr, data=data, cs=cs)
+            arr.extend(SEQ_PROGRAM_SUFFIX[cs])
+
+        return seq_program
+
     @classmethod
     def seq_erase(
         cls,
@@ -458,12 +722,164 @@ class PioCmdBuilder:
         block_addr: int,
     ) -> None:
         """Erase sequence for NAND Flash."""
-        cls.init_pin(arr)
-        cls.assert_cs(arr, cs=cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.ERASE_1ST, cs=cs)
+        # address以外はcsごとに事前生成したものをcopyする
+        arr.extend(Util.lookup_cs(SEQ_ERASE_PREFIX, cs))
         cls.block_addr_latch(arr, block_addr, cs)
-        cls.cmd_latch(arr, cmd=NandCommandId.ERASE_2ND, cs=cs)
-        cls.wait_rbb(arr)
-        cls.cmd_latch(arr, cmd=NandCommandId.STATUS_READ, cs=cs)
-        cls.data_output(arr, data_count=1)
-        cls.deassert_cs(arr)
+        arr.extend(SEQ_ERASE_SUFFIX[cs])
+
+
+# 転送数が固定のコマンドの先頭word
+CMD_HEADER_BITBANG: int = PioCmdBuilder.pack_cmd_header(
+    PioCmdId.Bitbang, PIN_DIR_WRITE, 1
+)
+CMD_HEADER_CMD_LATCH: int = PioCmdBuilder.pack_cmd_header(
+    PioCmdId.CmdLatch, PIN_DIR_WRITE, 1
+)
+CMD_HEADER_WAIT_RBB: int = PioCmdBuilder.pack_cmd_header(
+    PioCmdId.WaitRbb, PIN_DIR_WRITE, 1
+)
+CMD_HEADER_FULL_ADDR_LATCH: int = PioCmdBuilder.pack_cmd_header(
+    PioCmdId.AddrLatch, PIN_DIR_WRITE, NandAddr.FULL_ADDR_CYCLES
+)
+CMD_HEADER_BLOCK_ADDR_LATCH: int = PioCmdBuilder.pack_cmd_header(
+    PioCmdId.AddrLatch, PIN_DIR_WRITE, NandAddr.BLOCK_ADDR_CYCLES
+)
+
+# 引数を取らないコマンドの内容. 同じtypecodeのarrayなのでextendで一括copyされる (変更しないこと)
+INIT_PIN_WORDS = array.array("I", [CMD_HEADER_BITBANG, CEB_BITS_NONE])
+DEASSERT_CS_WORDS = array.array("I", [CMD_HEADER_BITBANG, CEB_BITS_NONE])
+WAIT_RBB_WORDS = array.array("I", [CMD_HEADER_WAIT_RBB, 0x00000000])
+
+# data_output/data_input_only_headerの先頭wordのcache (key: 転送数)
+CMD_HEADER_CACHE_SIZE = 64
+DATA_OUTPUT_HEADERS: dict = {}
+DATA_INPUT_HEADERS: dict = {}
+# status read/ID read/page R/Wで使う転送数は事前に登録しておく
+for _count in (
+    1,
+    len(NandConfig.READ_ID_EXPECT),
+    NandConfig.PAGE_USABLE_BYTES,
+    NandConfig.PAGE_ALL_BYTES,
+):
+    PioCmdBuilder.cached_cmd_header(
+        DATA_OUTPUT_HEADERS, PioCmdId.DataOutput, PIN_DIR_READ, _count
+    )
+    PioCmdBuilder.cached_cmd_header(
+        DATA_INPUT_HEADERS, PioCmdId.DataInput, PIN_DIR_WRITE, _count
+    )
+
+
+def _create_cmd_words(cmd: int) -> dict:
+    """cmd_latchの2word目(CEB0/CEB1付きのcommand)をcs(None含む)ごとに生成する"""
+    return {cs: Util.apply_cs(cmd, cs) for cs in CEB_BITS_BY_CS}
+
+
+# cmd_latchの2word目. csをkeyにして参照する (呼び出し時のshift/ORを省く)
+CMD_WORD_READ_1ST = _create_cmd_words(NandCommandId.READ_1ST)
+CMD_WORD_READ_2ND = _create_cmd_words(NandCommandId.READ_2ND)
+CMD_WORD_ERASE_1ST = _create_cmd_words(NandCommandId.ERASE_1ST)
+CMD_WORD_ERASE_2ND = _create_cmd_words(NandCommandId.ERASE_2ND)
+CMD_WORD_READ_ID = _create_cmd_words(NandCommandId.READ_ID)
+CMD_WORD_STATUS_READ = _create_cmd_words(NandCommandId.STATUS_READ)
+CMD_WORD_RESET = _create_cmd_words(NandCommandId.RESET)
+CMD_WORD_PROGRAM_1ST = _create_cmd_words(NandCommandId.PROGRAM_1ST)
+CMD_WORD_PROGRAM_2ND = _create_cmd_words(NandCommandId.PROGRAM_2ND)
+
+
+def _create_seq_program_prefix(cs: int) -> array.array:
+    """seq_programのaddress latchより前の部分を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.init_pin(arr)
+    PioCmdBuilder.assert_cs(arr, cs=cs)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.PROGRAM_1ST, cs=cs)
+    return arr
+
+
+def _create_seq_program_page_suffix(cs: int) -> array.array:
+    """seq_programのdata inputより後の、status readまでの部分を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.PROGRAM_2ND, cs=cs)
+    PioCmdBuilder.wait_rbb(arr)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.STATUS_READ, cs=cs)
+    PioCmdBuilder.data_output(arr, data_count=1)
+    return arr
+
+
+def _create_seq_program_suffix(cs: int) -> array.array:
+    """seq_programのdata inputより後の部分を生成する"""
+    arr = _create_seq_program_page_suffix(cs)
+    PioCmdBuilder.deassert_cs(arr)
+    return arr
+
+
+def _create_seq_reset(cs: int) -> array.array:
+    """seq_resetの全体を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.init_pin(arr)
+    PioCmdBuilder.assert_cs(arr, cs=cs)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.RESET, cs=cs)
+    PioCmdBuilder.wait_rbb(arr)
+    PioCmdBuilder.deassert_cs(arr)
+    return arr
+
+
+def _create_seq_status_read(cs: int) -> array.array:
+    """seq_status_readの全体を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.init_pin(arr)
+    PioCmdBuilder.assert_cs(arr, cs=cs)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.STATUS_READ, cs=cs)
+    PioCmdBuilder.data_output(arr, data_count=1)
+    PioCmdBuilder.deassert_cs(arr)
+    return arr
+
+
+def _create_seq_read_prefix(cs: int) -> array.array:
+    """seq_readのaddress latchより前の部分を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.init_pin(arr)
+    PioCmdBuilder.assert_cs(arr, cs=cs)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.READ_1ST, cs=cs)
+    return arr
+
+
+def _create_seq_read_middle(cs: int) -> array.array:
+    """seq_readのaddress latchとdata outputの間の部分を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.READ_2ND, cs=cs)
+    PioCmdBuilder.wait_rbb(arr)
+    return arr
+
+
+def _create_seq_erase_prefix(cs: int) -> array.array:
+    """seq_eraseのaddress latchより前の部分を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.init_pin(arr)
+    PioCmdBuilder.assert_cs(arr, cs=cs)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.ERASE_1ST, cs=cs)
+    return arr
+
+
+def _create_seq_erase_suffix(cs: int) -> array.array:
+    """seq_eraseのaddress latchより後の部分を生成する"""
+    arr = array.array("I")
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.ERASE_2ND, cs=cs)
+    PioCmdBuilder.wait_rbb(arr)
+    PioCmdBuilder.cmd_latch(arr, cmd=NandCommandId.STATUS_READ, cs=cs)
+    PioCmdBuilder.data_output(arr, data_count=1)
+    PioCmdBuilder.deassert_cs(arr)
+    return arr
+
+
+# seq_*の固定部分. cs(None含む)をkeyにして参照する
+SEQ_PROGRAM_PREFIX = {cs: _create_seq_program_prefix(cs) for cs in CEB_BITS_BY_CS}
+SEQ_PROGRAM_SUFFIX = {cs: _create_seq_program_suffix(cs) for cs in CEB_BITS_BY_CS}
+SEQ_PROGRAM_PAGE_SUFFIX = {
+    cs: _create_seq_program_page_suffix(cs) for cs in CEB_BITS_BY_CS
+}
+SEQ_RESET = {cs: _create_seq_reset(cs) for cs in CEB_BITS_BY_CS}
+SEQ_STATUS_READ = {cs: _create_seq_status_read(cs) for cs in CEB_BITS_BY_CS}
+SEQ_READ_PREFIX = {cs: _create_seq_read_prefix(cs) for cs in CEB_BITS_BY_CS}
+SEQ_READ_MIDDLE = {cs: _create_seq_read_middle(cs) for cs in CEB_BITS_BY_CS}
+SEQ_ERASE_PREFIX = {cs: _create_seq_erase_prefix(cs) for cs in CEB_BITS_BY_CS}
+SEQ_ERASE_SUFFIX = {cs: _create_seq_erase_suffix(cs) for cs in CEB_BITS_BY_CS}
@@ -1,15 +1,23 @@
 import array
 from dataclasses import dataclass
-import json
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 from collections import deque
+import functools
 import itertools
 import adafruit_pioasm
 import pioemu
 import wavedrom
 import svgwrite
+import orjson
+
+
+@functools.lru_cache(maxsize=8)
+def _assemble(program_str: str) -> array.array:
+    """pio textをアセンブルする. 同じtextは結果を使い回す (読み取り専用で使うこと)"""
+    return adafruit_pioasm.assemble(program_str)
 
 
 class Util:
@@ -22,6 +30,13 @@ class Util:
     def to_hex_str_arr(cls, src: List[int]) -> List[str]:
         return [cls.to_hex_u32(x) for x in src]
 
+    @staticmethod
+    def dumps_json(obj: Any, indent: bool = False) -> str:
+        """JSON文字列に変換する。大きなwavedrom定義のdumpが速いのでorjsonを使う (NaNはnullになる)"""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode(
+            "utf-8"
+        )
+
     @staticmethod
     def to_wavedrom_signal(
         df: pd.DataFrame,
@@ -73,6 +88,80 @@ class Util:
         return {"name": col, "wave": "".join(dst_wave), "data": dst_data}
 
 
+# event_dfのeventの種類. event列はこの順のcategoryとして格納する
+EVENT_TYPES: List[str] = ["cmd_in", "addr_in", "data_in", "data_out"]
+
+# Wavedromの信号定義のtemplate
+# ("data" | "signal", 列名) のtupleが、Util.to_wavedrom_data/signal の結果に置き換わる
+WAVE_TEMPLATE: List[Any] = [
+    [
+        "pio",
+        [
+            "ctrl",
+            ("data", "cyc"),
+            ("data", "pc"),
+            ("data", "inst"),
+            [
+                "fifo",
+                ["tx", ("data", "txfifo_head"), ("data", "txfifo_remain")],
+                ["rx", ("data", "rxfifo_tail"), ("data", "rxfifo_remain")],
+            ],
+        ],
+        {},
+        [
+            "regs",
+            ["scratch", ("data", "x"), ("data", "y")],
+            ["fifo", ("data", "isr"), ("data", "osr")],
+            ["pinout", ("data", "pindirs"), ("data", "pins")],
+        ],
+    ],
+    {},
+    [
+        "nand",
+        [
+            "out",
+            ["cs", ("signal", "ceb0"), ("signal", "ceb1")],
+            ["latch", ("signal", "cle"), ("signal", "ale")],
+            ["edge", ("signal", "web"), ("signal", "reb")],
+            ("signal", "wpb"),
+        ],
+        {},
+        ["inout", ("data", "io"), ("data", "io_dir")],
+        {},
+        ["in", ("signal", "rbb")],
+        {},
+        [
+            "analysis",
+            [
+                "src",
+                ("signal", "cs_assert"),
+                ("signal", "web_edge"),
+                ("signal", "reb_edge"),
+            ],
+            [
+                "event",
+                ("signal", "cmd_in"),
+                ("signal", "addr_in"),
+                ("signal", "data_in"),
+                ("signal", "data_out"),
+            ],
+        ],
+    ],
+]
+
+
+def _collect_wave_slots(node: Any) -> List[Tuple[str, str]]:
+    """WAVE_TEMPLATEから差し込み位置のtupleを出現順に列挙する"""
+    if isinstance(node, tuple):
+        return [node]
+    if isinstance(node, list):
+        return [slot for child in node for slot in _collect_wave_slots(child)]
+    return []
+
+
+WAVE_TEMPLATE_SLOTS: List[Tuple[str, str]] = _collect_wave_slots(WAVE_TEMPLATE)
+
+
 @dataclass
 class Result:
     """PIOのエミュレーション結果を格納するクラス"""
@@ -80,12 +169,23 @@ class Result:
     program_str: str
     test_cycles: int
     states_df: pd.DataFrame
-    event_df: pd.DataFrame
+    # イベントの各列. pandasを経由せずに検証できるようndarrayで持つ
+    events: Dict[str, np.ndarray]
     received_from_rx_fifo: List[int]
     tx_fifo: List[int]
     rx_fifo: List[int]
     wavedrom_src: str
-    wave_svg: svgwrite.drawing.Drawing
+    wave_svg: Optional[svgwrite.drawing.Drawing]
+
+    @functools.cached_property
+    def event_df(self) -> pd.DataFrame:
+        """eventsをDataFrameにしたもの. 初回参照時に生成する"""
+        if len(self.events["event"]) == 0:
+            return pd.DataFrame.from_records([])
+        event_df = pd.DataFrame(self.events)
+        # 種類が少ない文字列なので、categoryにして比較・保持を軽くする
+        event_df["event"] = pd.Categorical(event_df["event"], categories=EVENT_TYPES)
+        return event_df
 
     def save(self, dst_path: Path) -> None:
         """結果を指定されたパスに保存する"""
@@ -95,90 +195,49 @@ class Result:
         # 各種データを保存
         (dst_path / "program.txt").write_text(self.program_str, encoding="utf-8")
         (dst_path / "tx_fifo.json").write_text(
-            json.dumps(self.tx_fifo), encoding="utf-8"
+            Util.dumps_json(self.tx_fifo), encoding="utf-8"
         )
         (dst_path / "rx_fifo.json").write_text(
-            json.dumps(self.rx_fifo), encoding="utf-8"
+            Util.dumps_json(self.rx_fifo), encoding="utf-8"
         )
         (dst_path / "received_from_rx_fifo.json").write_text(
-            json.dumps(self.received_from_rx_fifo), encoding="utf-8"
+            Util.dumps_json(self.received_from_rx_fifo), encoding="utf-8"
         )
         Path(dst_path / "wave.json").write_text(self.wavedrom_src)
         self.states_df.to_csv(dst_path / "states.csv")
         self.event_df.to_csv(dst_path / "event.csv")
         self.states_df.to_json(dst_path / "states.json", orient="records")
         self.event_df.to_json(dst_path / "event.json", orient="records")
-        self.wave_svg.saveas(dst_path / "wave.svg")
+        # SVGはrender_svg指定時のみ生成される
+        if self.wave_svg is not None:
+            self.wave_svg.saveas(dst_path / "wave.svg")
 
 
 class Simulator:
     @staticmethod
-    def __analyze_steps(states_df: pd.DataFrame, opcodes: array.array) -> None:
-        def get_insert_idx() -> int:
-            """DataFrameに新しい列を挿入するためのインデックスを返す"""
-
-            dst = get_insert_idx.insert_idx  # increment前を返す
-            get_insert_idx.insert_idx += 1
-            return dst
-
-        get_insert_idx.insert_idx = 0
-
-        states_df.insert(
-            get_insert_idx(),
-            "cyc",
-            states_df["clock"],
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "pc",
-            states_df["program_counter"],
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "inst",
-            states_df["pc"].map(lambda pc: Util.to_hex_u32(opcodes[pc])),
+    def __analyze_steps(states_df: pd.DataFrame, opcodes: array.array) -> pd.DataFrame:
+        """各stepの情報をparseし、信号の情報を列として追加したDataFrameを返す"""
+        # 列ごとのinsertはDataFrame全体の再配置が毎回走るので、dictに集めて最後に1回で結合する
+        cols: Dict[str, pd.Series] = {}
+        cols["cyc"] = states_df["clock"]
+        cols["pc"] = states_df["program_counter"]
+        # 同じpcは何度も現れるので、命令ごとに1回だけ文字列化してlookupする
+        cols["inst"] = cols["pc"].map(pd.Series(Util.to_hex_str_arr(opcodes)))
+        cols["x"] = states_df["x_register"].map(Util.to_hex_u32)
+        cols["y"] = states_df["y_register"].map(Util.to_hex_u32)
+        cols["isr"] = states_df["input_shift_register"].map(
+            lambda sr: Util.to_hex_u32(sr.contents)
         )
-        states_df.insert(
-            get_insert_idx(), "x", states_df["x_register"].map(Util.to_hex_u32)
+        cols["osr"] = states_df["output_shift_register"].map(
+            lambda sr: Util.to_hex_u32(sr.contents)
         )
-        states_df.insert(
-            get_insert_idx(), "y", states_df["y_register"].map(Util.to_hex_u32)
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "isr",
-            states_df["input_shift_register"].map(
-                lambda sr: Util.to_hex_u32(sr.contents)
-            ),
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "osr",
-            states_df["output_shift_register"].map(
-                lambda sr: Util.to_hex_u32(sr.contents)
-            ),
+        cols["pindirs"] = states_df["pin_directions"].map(Util.to_hex_u32)
+        cols["pins"] = states_df["pin_values"].map(Util.to_hex_u32)
+        cols["io"] = states_df["pin_values"].map(
+            lambda data: Util.to_hex_u32((data & 0x000000FF))
         )
-        states_df.insert(
-            get_insert_idx(),
-            "pindirs",
-            states_df["pin_directions"].map(Util.to_hex_u32),
-        )
-        states_df.insert(
-            get_insert_idx(), "pins", states_df["pin_values"].map(Util.to_hex_u32)
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "io",
-            states_df["pin_values"].map(
-                lambda data: Util.to_hex_u32((data & 0x000000FF))
-            ),
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "io_dir",
-            states_df["pin_directions"].map(
-                lambda data: Util.to_hex_u32((data & 0x000000FF))
-            ),
+        cols["io_dir"] = states_df["pin_directions"].map(
+            lambda data: Util.to_hex_u32((data & 0x000000FF))
         )
 
         signals: List[(str, int)] = [
@@ -192,252 +251,176 @@ class Simulator:
             ("rbb", 15),
         ]
         for signal, bit_pos in signals:
-            states_df.insert(
-                get_insert_idx(),
-                signal,
-                states_df["pin_values"].map(lambda data: (data >> bit_pos) & 0x01),
+            cols[signal] = states_df["pin_values"].map(
+                lambda data: (data >> bit_pos) & 0x01
             )
 
-        states_df.insert(
-            get_insert_idx(),
-            "txfifo_head",
-            states_df["transmit_fifo"].map(
-                lambda data: Util.to_hex_u32(data[0]) if len(data) > 0 else None
-            ),
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "txfifo_remain",
-            states_df["transmit_fifo"].map(lambda data: len(data)),
+        cols["txfifo_head"] = states_df["transmit_fifo"].map(
+            lambda data: Util.to_hex_u32(data[0]) if len(data) > 0 else None
         )
-        states_df.insert(
-            get_insert_idx(),
-            "rxfifo_tail",
-            states_df["receive_fifo"].map(
-                lambda data: Util.to_hex_u32(data[-1]) if len(data) > 0 else None
-            ),
-        )
-        states_df.insert(
-            get_insert_idx(),
-            "rxfifo_remain",
-            states_df["receive_fifo"].map(lambda data: len(data)),
+        cols["txfifo_remain"] = states_df["transmit_fifo"].map(lambda data: len(data))
+        cols["rxfifo_tail"] = states_df["receive_fifo"].map(
+            lambda data: Util.to_hex_u32(data[-1]) if len(data) > 0 else None
         )
+        cols["rxfifo_remain"] = states_df["receive_fifo"].map(lambda data: len(data))
 
         # シーケンス解析
-        states_df["cs_assert"] = (states_df["ceb0"] == 0) | (states_df["ceb1"] == 0)
+        analysis: Dict[str, pd.Series] = {}
+        analysis["cs_assert"] = (cols["ceb0"] == 0) | (cols["ceb1"] == 0)
         # riseでNAND ICでキャプチャ想定
-        states_df["web_edge"] = (states_df["web"] == 1) & (
-            states_df.shift(1)["web"] == 0
-        )
+        analysis["web_edge"] = (cols["web"] == 1) & (cols["web"].shift(1) == 0)
         # fallでICから出力、(t_rea遅れて) riseでPIOでキャプチャ想定。両方用意する
-        states_df["reb_edge_nand"] = (states_df["reb"] == 0) & (
-            states_df.shift(1)["reb"] == 1
-        )
-        states_df["reb_edge_pio"] = (states_df["reb"] == 1) & (
-            states_df.shift(1)["reb"] == 0
+        analysis["reb_edge_nand"] = (cols["reb"] == 0) & (cols["reb"].shift(1) == 1)
+        analysis["reb_edge_pio"] = (cols["reb"] == 1) & (cols["reb"].shift(1) == 0)
+        analysis["reb_edge"] = analysis["reb_edge_pio"]
+
+        cols["cmd_in"] = (
+            analysis["web_edge"]
+            & analysis["cs_assert"]
+            & (cols["reb"] == 1)
+            & (cols["cle"] == 1)
+            & (cols["ale"] == 0)
         )
-        states_df["reb_edge"] = states_df["reb_edge_pio"]
-
-        states_df.insert(
-            get_insert_idx(),
-            "cmd_in",
-            states_df["web_edge"]
-            & states_df["cs_assert"]
-            & (states_df["reb"] == 1)
-            & (states_df["cle"] == 1)
-            & (states_df["ale"] == 0),
+        cols["addr_in"] = (
+            analysis["web_edge"]
+            & analysis["cs_assert"]
+            & (cols["reb"] == 1)
+            & (cols["cle"] == 0)
+            & (cols["ale"] == 1)
         )
-        states_df.insert(
-            get_insert_idx(),
-            "addr_in",
-            states_df["web_edge"]
-            & states_df["cs_assert"]
-            & (states_df["reb"] == 1)
-            & (states_df["cle"] == 0)
-            & (states_df["ale"] == 1),
+        cols["data_in"] = (
+            analysis["web_edge"]
+            & analysis["cs_assert"]
+            & (cols["reb"] == 1)
+            & (cols["cle"] == 0)
+            & (cols["ale"] == 0)
         )
-        states_df.insert(
-            get_insert_idx(),
-            "data_in",
-            states_df["web_edge"]
-            & states_df["cs_assert"]
-            & (states_df["reb"] == 1)
-            & (states_df["cle"] == 0)
-            & (states_df["ale"] == 0),
+        cols["data_out"] = (
+            analysis["reb_edge"]
+            & analysis["cs_assert"]
+            & (cols["web"] == 1)
+            & (cols["cle"] == 0)
+            & (cols["ale"] == 0)
         )
-        states_df.insert(
-            get_insert_idx(),
-            "data_out",
-            states_df["reb_edge"]
-            & states_df["cs_assert"]
-            & (states_df["web"] == 1)
-            & (states_df["cle"] == 0)
-            & (states_df["ale"] == 0),
+
+        # 解析結果を先頭、元のstate、シーケンス解析の順に並べる
+        return pd.concat(
+            [
+                pd.DataFrame(cols, index=states_df.index),
+                states_df,
+                pd.DataFrame(analysis, index=states_df.index),
+            ],
+            axis=1,
         )
 
     @staticmethod
-    def __extract_events(states_df: pd.DataFrame) -> pd.DataFrame:
-        """DataFrameからイベントを抽出して新しいDataFrameを返す"""
-        event_src = []
-        for _, row in states_df.iterrows():
-            event_type = None
-            if row["cmd_in"]:
-                event_type = "cmd_in"
-            elif row["addr_in"]:
-                event_type = "addr_in"
-            elif row["data_in"]:
-                event_type = "data_in"
-            elif row["data_out"]:
-                event_type = "data_out"
-            else:
-                continue
-            event_src.append(
-                {
-                    "cycle": row["cyc"],
-                    "pc": row["pc"],
-                    "event": event_type,
-                    "ceb0": row["ceb0"],
-                    "ceb1": row["ceb1"],
-                    "io": row["io"],
-                    "io_dir": row["io_dir"],
-                    # for testing
-                    "io_raw": int(row["io"], 16),
-                    "io_dir_raw": int(row["io_dir"], 16),
-                }
-            )
-        event_df = pd.DataFrame.from_records(event_src)
-        return event_df
+    def __extract_events(states_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """DataFrameからイベントを抽出して、列名をkeyにしたndarrayのdictを返す"""
+        # 1行ずつ見ずに、イベントのあるcycleだけを列単位で抜き出す
+        flags = [
+            states_df[event_type].to_numpy(dtype=bool) for event_type in EVENT_TYPES
+        ]
+        is_event = np.logical_or.reduce(flags)
+        src = states_df[is_event]
+        # 複数立っている場合はEVENT_TYPESの先頭を優先する
+        codes = np.select([f[is_event] for f in flags], range(len(EVENT_TYPES)))
+        return {
+            "cycle": src["cyc"].to_numpy(),
+            "pc": src["pc"].to_numpy(),
+            "event": np.asarray(EVENT_TYPES)[codes],
+            "ceb0": src["ceb0"].to_numpy(),
+            "ceb1": src["ceb1"].to_numpy(),
+            "io": src["io"].to_numpy(),
+            "io_dir": src["io_dir"].to_numpy(),
+            # for testing
+            "io_raw": (src["pin_values"] & 0xFF).to_numpy(),
+            "io_dir_raw": (src["pin_directions"] & 0xFF).to_numpy(),
+        }
 
     @staticmethod
     def __to_wavedrom(states_df: pd.DataFrame) -> object:
         """DataFrameからWavedromの信号定義を生成する"""
-        return {
-            "signal": [
-                [
-                    "pio",
-                    [
-                        "ctrl",
-                        Util.to_wavedrom_data(states_df, "cyc"),
-                        Util.to_wavedrom_data(states_df, "pc"),
-                        Util.to_wavedrom_data(states_df, "inst"),
-                        [
-                            "fifo",
-                            [
-                                "tx",
-                                Util.to_wavedrom_data(states_df, "txfifo_head"),
-                                Util.to_wavedrom_data(states_df, "txfifo_remain"),
-                            ],
-                            [
-                                "rx",
-                                Util.to_wavedrom_data(states_df, "rxfifo_tail"),
-                                Util.to_wavedrom_data(states_df, "rxfifo_remain"),
-                            ],
-                        ],
-                    ],
-                    {},
-                    [
-                        "regs",
-                        [
-                            "scratch",
-                            Util.to_wavedrom_data(states_df, "x"),
-                            Util.to_wavedrom_data(states_df, "y"),
-                        ],
-                        [
-                            "fifo",
-                            Util.to_wavedrom_data(states_df, "isr"),
-                            Util.to_wavedrom_data(states_df, "osr"),
-                        ],
-                        [
-                            "pinout",
-                            Util.to_wavedrom_data(states_df, "pindirs"),
-                            Util.to_wavedrom_data(states_df, "pins"),
-                        ],
-                    ],
-                ],
-                {},
-                [
-                    "nand",
-                    [
-                        "out",
-                        [
-                            "cs",
-                            Util.to_wavedrom_signal(states_df, "ceb0"),
-                            Util.to_wavedrom_signal(states_df, "ceb1"),
-                        ],
-                        [
-                            "latch",
-                            Util.to_wavedrom_signal(states_df, "cle"),
-                            Util.to_wavedrom_signal(states_df, "ale"),
-                        ],
-                        [
-                            "edge",
-                            Util.to_wavedrom_signal(states_df, "web"),
-                            Util.to_wavedrom_signal(states_df, "reb"),
-                        ],
-                        Util.to_wavedrom_signal(states_df, "wpb"),
-                    ],
-                    {},
-                    [
-                        "inout",
-                        Util.to_wavedrom_data(states_df, "io"),
-                        Util.to_wavedrom_data(states_df, "io_dir"),
-                    ],
-                    {},
-                    [
-                        "in",
-                        Util.to_wavedrom_signal(states_df, "rbb"),
-                    ],
-                    {},
-                    [
-                        "analysis",
-                        [
-                            "src",
-                            Util.to_wavedrom_signal(states_df, "cs_assert"),
-                            Util.to_wavedrom_signal(states_df, "web_edge"),
-                            Util.to_wavedrom_signal(states_df, "reb_edge"),
-                        ],
-                        [
-                            "event",
-                            Util.to_wavedrom_signal(states_df, "cmd_in"),
-                            Util.to_wavedrom_signal(states_df, "addr_in"),
-                            Util.to_wavedrom_signal(states_df, "data_in"),
-                            Util.to_wavedrom_signal(states_df, "data_out"),
-                        ],
-                    ],
-                ],
-            ]
+        # 各列の波形は1回だけ生成し、固定のtemplateに差し込む
+        waves = {
+            slot: (
+                Util.to_wavedrom_data(states_df, slot[1])
+                if slot[0] == "data"
+                else Util.to_wavedrom_signal(states_df, slot[1])
+            )
+            for slot in WAVE_TEMPLATE_SLOTS
         }
 
+        def fill(node: Any) -> Any:
+            if isinstance(node, tuple):
+                return waves[node]
+            if isinstance(node, list):
+                return [fill(child) for child in node]
+            if isinstance(node, dict):
+                return dict(node)
+            return node
+
+        return {"signal": fill(WAVE_TEMPLATE)}
+
     @staticmethod
     def __example_input_source(clock: int) -> int:
         """検証用な適当な入力を生成する"""
         return ((clock // 2) & 0xFF) | (0x8000 if (((clock // 8) % 2) == 1) else 0x0000)
 
+    def __init__(self, program_str: str) -> None:
+        """pio textをアセンブルして保持する. 同じprogramで繰り返しrunする場合に使う"""
+        self.program_str = program_str
+        self.opcodes: array.array = _assemble(program_str)
+
     @classmethod
     def execute(
         cls,
         program_str: str,
         test_cycles: int,
-        tx_fifo_entries: List[int] | array.array = [],
+        tx_fifo_entries: List[int] | array.array | None = None,
         # dequeue が速すぎると、simulator上のFIFOが常に空になってしまう
         dequeue_period_cyc: int = 6,
         input_source: Callable[[pioemu.State], int]
         | Callable[[int], int]
         | None = None,
+        # SVG描画は重いので、必要な場合のみ有効にする
+        render_svg: bool = False,
     ) -> Result:
         """PIOのsimulationを行う"""
+        return cls(program_str).run(
+            test_cycles=test_cycles,
+            tx_fifo_entries=tx_fifo_entries,
+            dequeue_period_cyc=dequeue_period_cyc,
+            input_source=input_source,
+            render_svg=render_svg,
+        )
 
+    def run(
+        self,
+        test_cycles: int,
+        tx_fifo_entries: List[int] | array.array | None = None,
+        # dequeue が速すぎると、simulator上のFIFOが常に空になってしまう
+        dequeue_period_cyc: int = 6,
+        input_source: Callable[[pioemu.State], int]
+        | Callable[[int], int]
+        | None = None,
+        # SVG描画は重いので、必要な場合のみ有効にする
+        render_svg: bool = False,
+    ) -> Result:
+        """アセンブル済みのprogramでPIOのsimulationを行う"""
+
+        # 省略時は空. defaultのlistを共有しないよう、呼び出しごとに生成する
+        if tx_fifo_entries is None:
+            tx_fifo_entries = []
         # tx_fifo_entries が array.array の場合は List[int] に変換
-        if isinstance(tx_fifo_entries, array.array):
+        elif isinstance(tx_fifo_entries, array.array):
             tx_fifo_entries = list(tx_fifo_entries)
 
-        # pio textをアセンブルして、opcodesを生成
-        opcodes: array.array = adafruit_pioasm.assemble(program_str)
+        opcodes = self.opcodes
         # emulatorセットアップ
         emu_generator = pioemu.emulate(
             opcodes=opcodes,
             stop_when=lambda _, state: state.clock > test_cycles,
-            input_source=cls.__example_input_source
+            input_source=self.__example_input_source
             if input_source is None
             else input_source,
             initial_state=pioemu.State(
@@ -457,11 +440,14 @@ class Simulator:
         )
 
         # stepを進め、pinの状態, fifoの状態を収集
-        run_states: List[Any] = []
+        # step数の上限はtest_cyclesなので事前に確保しておく
+        run_states: List[Any] = [None] * test_cycles
+        run_count = 0
         received_data: List[int] = []
         dma_dequeue_ready_cnt = 0  # dequeue_period_cycより大きければDequeue可能
         for before, after in itertools.islice(emu_generator, test_cycles):
-            run_states.append(after.__dict__)
+            run_states[run_count] = after.__dict__
+            run_count += 1
             # dequeue
             dma_dequeue_ready_cnt += 1
             if (dma_dequeue_ready_cnt > dequeue_period_cyc) and (
@@ -470,24 +456,27 @@ class Simulator:
                 received_data.append(after.receive_fifo.popleft())
                 dma_dequeue_ready_cnt = 0
 
+        # 途中で停止した場合は未使用の領域を切り詰める
+        del run_states[run_count:]
+
+        # 最終stepのrxfifoの状態を抽出
+        rx_fifo = list(run_states[-1]["receive_fifo"])
         # 各stepで収集したstateをDataFrameに変換
         states_df = pd.DataFrame.from_records(run_states)
-        # 最終stepのrxfifoの状態を抽出
-        rx_fifo = list(states_df[-1:]["receive_fifo"].values[0])
         # 各stepの情報をparseし、信号の情報を抽出
-        cls.__analyze_steps(states_df, opcodes)
+        states_df = self.__analyze_steps(states_df, opcodes)
         # イベントだけを抽出しておく
-        event_df = cls.__extract_events(states_df)
-        # wavedrom向けobjectに変換し、SVGに変換
-        wavedrom_src = json.dumps(cls.__to_wavedrom(states_df), indent=2)
-        wave_svg = wavedrom.render(wavedrom_src)
+        events = self.__extract_events(states_df)
+        # wavedrom向けobjectに変換し、必要ならSVGに変換
+        wavedrom_src = Util.dumps_json(self.__to_wavedrom(states_df), indent=True)
+        wave_svg = wavedrom.render(wavedrom_src) if render_svg else None
 
         return Result(
-            program_str=program_str,
+            program_str=self.program_str,
             test_cycles=test_cycles,
             tx_fifo=tx_fifo_entries,
             states_df=states_df,
-            event_df=event_df,
+            events=events,
             rx_fifo=rx_fifo,
             received_from_rx_fifo=received_data,
             wavedrom_src=wavedrom_src,